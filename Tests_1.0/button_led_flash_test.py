@@ -21,9 +21,10 @@ Hardware Setup
 
 Behavior
 --------
-1. Wait for button press (LOW).
-2. When pressed, flash LED for 10 seconds (0.2s period).
-3. Turn LED off and wait for button release.
+1. Sleep (machine.lightsleep) until the button IRQ reports a press (falling edge).
+2. Confirm the press after a short debounce delay, then flash the LED for
+   10 seconds (0.2s period).
+3. Turn LED off and wait (lightsleep) for button release.
 4. Return to waiting for next press (loop forever).
 
 Usage
@@ -31,7 +32,7 @@ Usage
     mpremote connect COM9 run button_led_flash_test.py
 """
 
-from machine import Pin
+from machine import Pin, lightsleep
 import time
 
 # ---------------------------------------------------------------------------
@@ -39,18 +40,38 @@ import time
 # ---------------------------------------------------------------------------
 BUTTON_PIN = "D2"    # Pushbutton pin (active LOW)
 LED_PIN = "D13"      # Onboard LED pin
+DEBOUNCE_MS = 20     # Press must still read LOW this long after the edge
+SLEEP_MS = 50        # Upper bound on each lightsleep while idle
 
 # Configure LED output and button input with pull-up
 led = Pin(LED_PIN, Pin.OUT)
 button = Pin(BUTTON_PIN, Pin.IN, Pin.PULL_UP)
 
+# ---------------------------------------------------------------------------
+# Button interrupt: the ISR only records the edge; the main loop does the work
+# ---------------------------------------------------------------------------
+pressed = False
+
+def _on_press(p):
+    """Falling-edge handler for the button (runs in IRQ context)."""
+    global pressed
+    pressed = True
+
+button.irq(trigger=Pin.IRQ_FALLING, handler=_on_press)
+
 print("Press the button to make the LED flash for 10 seconds...")
 
 # ---------------------------------------------------------------------------
 # Main loop
 # ---------------------------------------------------------------------------
 while True:
-    # Wait for button press (active LOW)
+    # Sleep until the IRQ flags a press instead of spinning on button.value()
+    while not pressed:
+        lightsleep(SLEEP_MS)
+    pressed = False
+
+    # Debounce: ignore bounces/glitches that are no longer LOW after the delay
+    time.sleep_ms(DEBOUNCE_MS)
     if button.value() == 0:
         print("Button pressed! Flashing LED...")
         start_time = time.ticks_ms()
@@ -66,4 +87,4 @@ while True:
 
         # Wait for button release before restarting loop
         while button.value() == 0:
-            time.sleep_ms(20)
+            lightsleep(SLEEP_MS)
@@ -10,10 +10,11 @@ I2S microphone sampler and simple level meter (Teensy 4.1 + SPH0645)
 Overview
 --------
 - Waits for a single active-LOW button press on D2.
-- Captures 5 short I2S chunks from an SPH0645 mic at 44.1 kHz (32-bit words with
-  24-bit valid data in the top bits).
-- Converts each 24-bit sample to int16 (by shifting >> 8, with clipping).
-- Computes three quick metrics per chunk:
+- Reads an SPH0645 mic at 44.1 kHz (32-bit words with 24-bit valid data in the
+  top bits) back-to-back, and analyzes every SKIP-th chunk until 5 are done.
+- Converts each 24-bit sample to int16 (by shifting >> 8; always in range) in a
+  viper-compiled kernel that writes into a preallocated int16 array.
+- Computes three quick metrics per chunk in a single native pass:
     * avgAbs: average absolute amplitude
     * peak : maximum absolute amplitude
     * rms  : root-mean-square amplitude (int16 domain)
@@ -21,9 +22,12 @@ Overview
 
 Notes
 -----
-- Byte order for unpacking is little-endian ("<I"), matching Teensy behavior.
+- The 32-bit words are read in place as native little-endian words (ptr32),
+  matching Teensy behavior; no struct unpacking on the hot path.
 - This script is for quick terminal-level feedback; it does not write to disk.
-- Timing, chunk sizes, and loop counts are unchanged from the original.
+- Chunk sizes and loop counts are unchanged from the original. Instead of sleeping
+  between chunks, the skipped chunks are still read so I2S never overruns and each
+  analyzed chunk is fresh, contiguous audio.
 
 Hardware
 --------
@@ -32,11 +36,9 @@ Hardware
 - I2S pins  : BCLK=D21, WS/LRCLK=D20, SD/DOUT=D8, MCK=D23 (mic ignores MCK)
 """
 
-from machine import Pin, I2S
-import time
-import struct
+from machine import Pin, I2S, lightsleep
 import array
-import math
+import micropython
 
 # ---------------------------------------------------------------------------
 # Pin assignments (MicroPython pin names, not Arduino numbers)
@@ -52,9 +54,14 @@ BCLK_PIN, WS_PIN, SD_PIN, MCK_PIN = "D21", "D20", "D8", "D23"
 btn = Pin(BUTTON_PIN, Pin.IN, Pin.PULL_UP)        # Active-LOW: pressed -> 0
 led = Pin(LED_PIN, Pin.OUT)
 
+# The press edge raises an IRQ, which wakes the CPU out of lightsleep early;
+# the handler itself has nothing to do.
+SLEEP_MS = 50                                     # Upper bound on each lightsleep
+btn.irq(trigger=Pin.IRQ_FALLING, handler=lambda p: None)
+
 print("Waiting for button press...")
 while btn.value():                                # Wait until button pressed
-    time.sleep_ms(20)
+    lightsleep(SLEEP_MS)
 led.on()                                          # LED on while capturing/processing
 
 # ---------------------------------------------------------------------------
@@ -78,83 +85,116 @@ i2s = I2S(
 buf = bytearray(4096)
 mv = memoryview(buf)
 
+# Converted int16 samples for one chunk; allocated once and reused every chunk
+vals16 = array.array('h', bytes(2 * (len(buf) // 4)))
+
+# Per-chunk reduction results: peak, sum|x|, sum(x*x) low word, sum(x*x) high word
+sums = array.array('I', [0, 0, 0, 0])
+
 # ---------------------------------------------------------------------------
-# Helper: convert an unsigned 32-bit word to a signed 24-bit integer
-# The SPH0645 places its valid 24-bit sample in the top 24 bits of the 32-bit frame.
+# Kernel: convert 32-bit I2S words to int16 samples (native code)
+# The SPH0645 places its valid 24-bit sample in the top 24 bits of the 32-bit frame,
+# so the int16 value is bits 31..16 of each word, read as two's complement.
 # ---------------------------------------------------------------------------
-def to_signed24(v: int) -> int:
+@micropython.viper
+def convert(src: ptr32, dst: ptr16, n: int):
     """
-    Interpret the lower 24 bits of `v` as a signed two's-complement 24-bit integer.
+    Convert `n` raw 32-bit words from `src` into int16 samples stored in `dst`.
     """
-    v &= 0xFFFFFF                # Keep only 24 bits
-    if v & 0x800000:             # Sign bit set?
-        v -= 1 << 24             # Sign-extend into Python int
-    return v
+    for i in range(n):
+        # Arithmetic shift of the signed word keeps the top 16 of the 24 valid
+        # bits, already sign-extended; the result is always within int16, so
+        # no clipping branches are needed.
+        dst[i] = int(src[i]) >> 16
 
 # ---------------------------------------------------------------------------
-# Helper: calculate RMS (root-mean-square) for int16 array
+# Kernel: peak, sum of |x| and sum of x*x over int16 samples in one pass
+# Viper ints are 32-bit, so sum(x*x) is carried across two words.
 # ---------------------------------------------------------------------------
-def rms_int16(vals: array.array) -> int:
+@micropython.viper
+def stats(p: ptr16, n: int, out: ptr32):
+    """
+    Reduce the first `n` int16 samples in `p` into `out`:
+    out[0] = peak |x|, out[1] = sum |x|, out[2]/out[3] = sum x*x (low/high word).
+    """
+    peak = 0
+    total_abs = 0
+    lo = uint(0)
+    hi = 0
+    for i in range(n):
+        v = int(p[i])
+        if v & 0x8000:               # ptr16 loads are unsigned; sign-extend
+            v -= 0x10000
+        if v < 0:
+            v = -v
+        total_abs += v
+        if v > peak:
+            peak = v
+        sq = uint(v * v)
+        lo += sq
+        if lo < sq:                  # Carry out of the low word
+            hi += 1
+    out[0] = peak
+    out[1] = total_abs
+    out[2] = lo
+    out[3] = hi
+
+# ---------------------------------------------------------------------------
+# Helper: integer square root (keeps RMS out of floating point)
+# ---------------------------------------------------------------------------
+@micropython.viper
+def isqrt(x: uint) -> int:
     """
-    Compute the RMS value of a sequence of int16 samples.
-    Returns an integer RMS for quick textual display.
+    Return floor(sqrt(x)) for a 32-bit unsigned value.
     """
-    acc = 0
-    for x in vals:
-        acc += x * x
-    return int(math.sqrt(acc / len(vals))) if vals else 0
+    r = uint(0)
+    bit = uint(1 << 30)
+    while bit > x:
+        bit >>= 2
+    while bit != 0:
+        if x >= r + bit:
+            x -= r + bit
+            r = (r >> 1) + bit
+        else:
+            r >>= 1
+        bit >>= 2
+    return int(r)
 
 # ---------------------------------------------------------------------------
 # Main loop: capture a few short chunks and print audio metrics
 # Each chunk ~0.023 s of audio (1024 samples @ 44.1 kHz)
 # ---------------------------------------------------------------------------
+SKIP = 8                         # Analyze every 8th chunk (~185 ms apart)
+
 for k in range(5):
+    # Keep draining I2S between analyzed chunks instead of sleeping
+    for _ in range(SKIP - 1):
+        i2s.readinto(mv)
     n = i2s.readinto(mv)         # Fill buffer with audio data from mic
     if not n:
         print("Chunk %d: no data" % (k + 1))
-        time.sleep_ms(150)
         continue
 
-    # -----------------------------------------------------------------------
-    # Parse 32-bit words as LITTLE-ENDIAN (correct byte order for Teensy)
-    # -----------------------------------------------------------------------
-    words = struct.unpack("<%dI" % (n // 4), mv[:n])
-
     # -----------------------------------------------------------------------
     # Convert each 24-bit signed sample to a 16-bit value
-    # Scale 24-bit down to 16-bit by shifting >> 8 (with clipping).
+    # Scale 24-bit down to 16-bit by shifting >> 8 (result always fits int16).
     # -----------------------------------------------------------------------
-    vals16 = array.array('h')     # 'h' = signed 16-bit
-    append = vals16.append        # local binding for speed in the tight loop
-    for w in words:
-        s24 = to_signed24(w >> 8) # Drop the low 8 "don't care" bits
-        s16 = s24 >> 8            # Scale from 24-bit to ~16-bit
-        # Clip to valid int16 range
-        if s16 < -32768:
-            s16 = -32768
-        elif s16 > 32767:
-            s16 = 32767
-        append(s16)
+    count = n // 4
+    convert(buf, vals16, count)
 
     # -----------------------------------------------------------------------
     # Compute average absolute value, peak amplitude, and RMS
     # Rough loudness indicators suitable for terminal display.
     # -----------------------------------------------------------------------
-    peak = 0
-    total_abs = 0
-    for v in vals16:
-        a = -v if v < 0 else v
-        total_abs += a
-        if a > peak:
-            peak = a
-    avgAbs = total_abs // len(vals16)
-    rms = rms_int16(vals16)
+    stats(vals16, count, sums)
+    peak = sums[0]
+    avgAbs = sums[1] // count
+    rms = isqrt(((sums[3] << 32) | sums[2]) // count)
 
     print(
         "Chunk %d: samples=%d  avgAbs=%d  peak=%d  rms=%d"
-        % (k + 1, len(vals16), avgAbs, peak, rms)
+        % (k + 1, count, avgAbs, peak, rms)
     )
-    time.sleep_ms(150)
 
 # ---------------------------------------------------------------------------
 # Clean up hardware resources
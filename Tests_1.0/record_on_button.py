@@ -20,6 +20,8 @@ Notes
 - File writing is atomic: data is captured into a temporary file (*.tmp) and then
   renamed into place after the WAV sizes are patched.
 - The WAV header is written up front with placeholder sizes and patched on completion.
+- I2S runs in non-blocking (IRQ) mode with two ping-pong buffers, so one buffer is
+  converted and written to SD while the driver fills the other.
 - MCK is provided in the I2S constructor but the SPH0645 ignores it; leaving it in
   matches many working pinouts. A commented alternative shows how to omit it entirely.
 - Do not modify constants or logic unless you intend to change functionality.
@@ -35,10 +37,13 @@ Tested Environment
 - MicroPython/Teensy 4.1 style I2S API (using `machine.I2S`).
 """
 
+import gc
 import os
 import time
+import array
 import struct
-from machine import Pin, I2S
+import micropython
+from machine import Pin, I2S, idle, lightsleep
 
 # ---------- Pins (match your working test) ----------
 BUTTON_PIN, LED_PIN = "D2", "D13"
@@ -51,33 +56,43 @@ SECONDS = 20            # Recording duration in seconds (set to 60 for 1 minute)
 CHANNELS = 1            # Mono (SPH0645 is mono)
 BITS_OUT = 16           # WAV bit depth (we write 16-bit PCM)
 MOUNT = "/sdcard"       # SD card mount path
-READ_BYTES = 4096       # I2S read chunk size (bytes); must be multiple of 4 (32-bit words)
-IBUF_BYTES = 20000      # I2S internal DMA buffer size (bytes)
+READ_BYTES = 16384      # I2S read chunk size (bytes); must be multiple of 4 (32-bit words)
+                        # -> one 8 KB (16 x 512 B sector) SD write per chunk
+IBUF_BYTES = 65536      # I2S internal DMA buffer size (bytes); keep >= 4 * READ_BYTES
+SLEEP_MS = 50           # Upper bound on each lightsleep while waiting for the button
+GC_FREE_MIN = 32768     # Collect between chunks only when free heap drops below this
 
 # ---------- I/O ----------
 btn = Pin(BUTTON_PIN, Pin.IN, Pin.PULL_UP)  # Active-LOW: pressed -> 0
 led = Pin(LED_PIN, Pin.OUT)
 led.off()
+_led_state = 0  # Last value written to the LED (avoids reading the pin back)
+
+# Set by the I2S callback when a non-blocking readinto() has filled its buffer.
+_rx_done = False
 
 # ---------- Helpers ----------
-def to_signed24(v: int) -> int:
+@micropython.viper
+def convert(src: ptr32, dst: ptr16, n: int):
     """
-    Convert a raw value to signed 24-bit two's-complement.
+    Convert raw I2S words to signed 16-bit PCM in native code.
+
+    The SPH0645 places its 24-bit sample in the top 24 bits of each 32-bit
+    word, so the 16-bit sample is bits 31..16 read as two's complement. An
+    arithmetic shift of the signed word yields exactly that, and the result
+    always fits int16, so no clipping is needed.
 
     Parameters
     ----------
-    v : int
-        Input integer (mask will constrain to 24 bits).
-
-    Returns
-    -------
-    int
-        The same value interpreted as signed 24-bit.
+    src : ptr32
+        Buffer of raw 32-bit little-endian words from I2S.
+    dst : ptr16
+        Output buffer receiving one 16-bit sample per input word.
+    n : int
+        Number of words to convert.
     """
-    v &= 0xFFFFFF
-    if v & 0x800000:
-        v -= 1 << 24
-    return v
+    for i in range(n):
+        dst[i] = int(src[i]) >> 16  # upper 16 of the 24 valid bits, signed
 
 
 def wav_write_header(f, nchan: int, rate: int, bits: int, data_len: int) -> None:
@@ -104,43 +119,34 @@ def wav_write_header(f, nchan: int, rate: int, bits: int, data_len: int) -> None
     block_align = nchan * bits // 8
     riff_size = 36 + data_len  # 4 + (8+16) + (8+data_len)
 
-    f.write(b"RIFF")
-    f.write(riff_size.to_bytes(4, "little"))
-    f.write(b"WAVE")
-
-    # 'fmt ' subchunk (PCM)
-    f.write(b"fmt ")
-    f.write((16).to_bytes(4, "little"))         # Subchunk1Size (16 for PCM)
-    f.write((1).to_bytes(2, "little"))          # AudioFormat (1 = PCM)
-    f.write(nchan.to_bytes(2, "little"))        # NumChannels
-    f.write(rate.to_bytes(4, "little"))         # SampleRate
-    f.write(byte_rate.to_bytes(4, "little"))    # ByteRate
-    f.write(block_align.to_bytes(2, "little"))  # BlockAlign
-    f.write(bits.to_bytes(2, "little"))         # BitsPerSample
-
-    # 'data' subchunk header
-    f.write(b"data")
-    f.write(data_len.to_bytes(4, "little"))     # Subchunk2Size
+    # Whole 44-byte header in one write: RIFF/WAVE, 'fmt ' (PCM), 'data' header.
+    f.write(struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", riff_size, b"WAVE",
+        b"fmt ", 16, 1,          # Subchunk1Size (16 for PCM), AudioFormat (1 = PCM)
+        nchan, rate, byte_rate,  # NumChannels, SampleRate, ByteRate
+        block_align, bits,       # BlockAlign, BitsPerSample
+        b"data", data_len,       # Subchunk2Size
+    ))
 
 
-def patch_wav_sizes(path: str, data_len: int) -> None:
+def patch_wav_sizes(f, data_len: int) -> None:
     """
     Patch the WAV header sizes (RIFF and data chunk) after recording completes.
 
     Parameters
     ----------
-    path : str
-        Path to the WAV file to patch.
+    f : io.BufferedWriter
+        The still-open WAV file (binary); left positioned after the data chunk size.
     data_len : int
         Actual number of data bytes written after the header.
     """
-    with open(path, "r+b") as f:
-        riff_size = 36 + data_len
-        # RIFF size at offset 4, data size at offset 40
-        f.seek(4)
-        f.write(riff_size.to_bytes(4, "little"))
-        f.seek(40)
-        f.write(data_len.to_bytes(4, "little"))
+    riff_size = 36 + data_len
+    # RIFF size at offset 4, data size at offset 40
+    f.seek(4)
+    f.write(riff_size.to_bytes(4, "little"))
+    f.seek(40)
+    f.write(data_len.to_bytes(4, "little"))
 
 
 def make_name() -> str:
@@ -179,13 +185,28 @@ def flash_toggle(last_ms: int, period: int = 100) -> int:
     int
         Possibly updated timestamp of the last toggle.
     """
+    global _led_state
     now = time.ticks_ms()
     if time.ticks_diff(now, last_ms) >= period:
-        led.value(0 if led.value() else 1)
+        _led_state ^= 1
+        led.value(_led_state)
         return now
     return last_ms
 
 
+def _on_rx(i2s) -> None:
+    """
+    I2S callback: the buffer passed to the last readinto() is full.
+
+    Parameters
+    ----------
+    i2s : machine.I2S
+        The I2S instance that raised the interrupt (unused).
+    """
+    global _rx_done
+    _rx_done = True
+
+
 # ---------- Recorder ----------
 def record_once(seconds: int = SECONDS) -> None:
     """
@@ -195,21 +216,24 @@ def record_once(seconds: int = SECONDS) -> None:
     -----
     1) Ensure SD card mount is accessible.
     2) Configure I2S in RX (receive) mode to read 32-bit frames at 44.1 kHz.
-    3) Create buffers and open a temporary output file.
+    3) Create ping-pong buffers and open a temporary output file.
     4) Write a placeholder WAV header (sizes patched after capture).
-    5) Loop until duration elapses:
+    5) Switch I2S to non-blocking mode and loop until duration elapses:
          - Blink LED periodically,
-         - Read I2S DMA into a 32-bit buffer,
-         - Convert each 24-bit sample (upper 24 bits of the 32-bit word)
-           to clipped 16-bit PCM,
+         - When the I2S callback reports a full 32-bit buffer, start filling
+           the other buffer,
+         - Convert each 24-bit sample (upper 24 bits of the 32-bit word) in
+           the full buffer to 16-bit PCM,
          - Append to file.
-    6) Deinit I2S, patch sizes, and atomically rename temp -> final.
+    6) Patch sizes in the open file, deinit I2S, and atomically rename temp -> final.
 
     Parameters
     ----------
     seconds : int, optional
         Recording length in seconds, by default SECONDS.
     """
+    global _rx_done, _led_state
+
     # 1) Ensure /sdcard exists and is mounted (raises if not).
     _ = os.listdir(MOUNT)
 
@@ -237,10 +261,10 @@ def record_once(seconds: int = SECONDS) -> None:
     final = make_name()
     tmp = final + ".tmp"
 
-    in_buf = bytearray(READ_BYTES)        # Raw 32-bit frames from I2S
-    mv_in = memoryview(in_buf)
-    out_buf = bytearray(READ_BYTES // 2)  # 16-bit PCM (half the bytes of 32-bit input)
-    mv_out = memoryview(out_buf)
+    # Raw 32-bit frames from I2S: one buffer is filled while the other is processed.
+    in_bufs = (bytearray(READ_BYTES), bytearray(READ_BYTES))
+    words = READ_BYTES // 4
+    out_arr = array.array("h", bytes(READ_BYTES // 2))  # 16-bit PCM, one item per input word
 
     try:
         with open(tmp, "wb") as f:
@@ -248,61 +272,70 @@ def record_once(seconds: int = SECONDS) -> None:
             wav_write_header(f, CHANNELS, RATE, BITS_OUT, 0)
             data_bytes = 0
 
-            # Prime DMA once to reduce initial underflow.
-            _ = i2s.readinto(mv_in)
+            # Non-blocking mode: readinto() returns at once and _on_rx fires when
+            # the buffer is full. Start filling the first buffer right away.
+            _rx_done = False
+            i2s.irq(_on_rx)
+            cur = 0
+            i2s.readinto(in_bufs[cur])
 
             # Timing for duration and LED blink.
             end_at = time.ticks_add(time.ticks_ms(), seconds * 1000)
             last_led = time.ticks_ms()
             led.on()
+            _led_state = 1
             print("Recording to:", final)
 
+            # No automatic GC pauses mid-recording: the loop below allocates
+            # nothing (preallocated buffers, viper kernel, small-int counters).
+            gc.collect()
+            gc.disable()
+
             # 5) Main capture loop.
             while time.ticks_diff(end_at, time.ticks_ms()) > 0:
                 # Blink LED at 10 Hz to show liveness.
                 last_led = flash_toggle(last_led, 100)
 
-                # Read a chunk of 32-bit words into mv_in.
-                n = i2s.readinto(mv_in)
-                if not n:
-                    # If DMA had no data yet, yield briefly and retry.
-                    time.sleep_ms(1)
+                # Wait (CPU parked until the next interrupt) for a full buffer.
+                if not _rx_done:
+                    idle()
                     continue
+                _rx_done = False
+
+                # Hand the other buffer to the driver before touching this one.
+                full = in_bufs[cur]
+                cur ^= 1
+                i2s.readinto(in_bufs[cur])
 
                 # Convert little-endian 32-bit words -> signed 16-bit PCM.
-                # SPH0645 places the 24-bit sample in the top 24 bits; shift down 8,
-                # interpret as signed 24, then downscale to ~16 bits with clipping.
-                words = struct.unpack("<%dI" % (n // 4), mv_in[:n])
-
-                out_i = 0
-                for w in words:
-                    s24 = to_signed24(w >> 8)   # keep signed 24 (upper bits)
-                    s16 = s24 >> 8              # downscale to ~16-bit range
-                    if s16 < -32768:
-                        s16 = -32768
-                    elif s16 > 32767:
-                        s16 = 32767
-                    struct.pack_into("<h", mv_out, out_i, s16)
-                    out_i += 2  # 2 bytes per 16-bit sample
+                # SPH0645 places the 24-bit sample in the top 24 bits; the viper
+                # kernel keeps the upper 16 bits as signed PCM.
+                convert(full, out_arr, words)
 
                 # Write the converted PCM to disk.
-                f.write(mv_out[:out_i])
-                data_bytes += out_i
+                f.write(out_arr)
+                data_bytes += words * 2  # 2 bytes per 16-bit sample
+
+                # Safety net while automatic GC is off: collect between chunks
+                # only when the heap is running low.
+                if gc.mem_free() < GC_FREE_MIN:
+                    gc.collect()
 
-                # Micro-yield to keep system responsive.
-                time.sleep_ms(0)
+            # 6a) Patch header sizes through the same handle (no reopen).
+            patch_wav_sizes(f, data_bytes)
 
         led.off()
+        _led_state = 0
 
     finally:
-        # 6a) Always release the I2S peripheral, even on exceptions.
+        # 6b) Always re-enable GC and release the I2S peripheral, even on exceptions.
+        gc.enable()
         try:
             i2s.deinit()
         except Exception:
             pass
 
-    # 6b) Patch header sizes and atomically move temp into place.
-    patch_wav_sizes(tmp, data_bytes)
+    # 6c) Atomically move temp into place.
     time.sleep_ms(20)
     try:
         os.rename(tmp, final)
@@ -321,10 +354,12 @@ def record_once(seconds: int = SECONDS) -> None:
 print("Waiting for button...")
 
 # Debounced wait for a single active-LOW press:
-# 1) Wait until button goes LOW,
+# 1) Wait until button goes LOW (lightsleep; the press IRQ wakes the CPU early),
 # 2) Ensure it remained LOW for at least ~30 ms, then proceed.
+btn.irq(trigger=Pin.IRQ_FALLING, handler=lambda p: None)
 while btn.value() != 0:
-    time.sleep_ms(10)
+    lightsleep(SLEEP_MS)
+btn.irq(handler=None)
 
 t0 = time.ticks_ms()
 while btn.value() == 0 and time.ticks_diff(time.ticks_ms(), t0) < 30:
@@ -1,17 +1,22 @@
 # sd_write_test_confirm2.py
-# Simple, atomic write/read confirmation on /sdcard using a temp file rename.
+# Simple write/read confirmation on /sdcard: direct write for tiny payloads,
+# atomic temp file rename for larger ones.
 
 """
-SD Card Write/Read Confirmation (Atomic Rename)
+SD Card Write/Read Confirmation (Direct Write / Atomic Rename)
 
 What this script does
 ---------------------
 1) Verifies that the SD card mount exists and lists its contents.
-2) Writes a small payload to a temporary file (TARGET.tmp) and closes it.
-3) Stats the temp file (for visibility), then atomically renames it to TARGET.
-4) Briefly yields (sleep) to let the filesystem settle.
-5) Re-opens TARGET, reads the contents, and verifies it matches the original data.
-6) Prints PASS/FAIL and exits with an explicit SystemExit code:
+2) Writes the payload:
+     - Small payloads (< one 512 B sector) are written straight to TARGET and
+       flushed with os.sync(). This path is NOT atomic: open("wb") truncates
+       TARGET first, and FAT updates the directory entry, the FAT and the data
+       sector separately, so a crash mid-write can leave TARGET empty or partial.
+     - Larger payloads go to a temporary file (TARGET.tmp), which is then
+       atomically renamed to TARGET.
+3) Re-opens TARGET, reads the contents, and verifies it matches the original data.
+4) Prints PASS/FAIL and exits with an explicit SystemExit code:
      - 0 = PASS
      - 1 = SD mount missing
      - 2 = rename failed (cleanup attempted)
@@ -20,7 +25,9 @@ What this script does
 Why use a temp -> rename?
 -------------------------
 Atomic replacement helps avoid partial/tearing writes. The final file only appears
-in its complete form after the rename succeeds.
+in its complete form after the rename succeeds. For a payload under one sector
+this test gives up that atomicity in exchange for fewer FS operations (no temp
+file create, rename or extra directory update).
 
 Environment
 -----------
@@ -29,13 +36,14 @@ Environment
 
 import os
 import sys
-import time
 
 # ---------- Configuration ----------
 MOUNT = "/sdcard"
 TARGET = MOUNT + "/test.txt"
 TEMP = TARGET + ".tmp"
 DATA = b"Hello SD Card!"  # Arbitrary test payload
+SECTOR = 512              # Payloads smaller than this skip the temp -> rename path
+VERBOSE = False           # Also stat the temp file (informational only)
 
 
 def log(*a):
@@ -61,34 +69,42 @@ except Exception as e:
     log("FATAL: mount missing:", e)
     raise SystemExit(1)
 
-# ---------- Step 1: Write to TEMP and close ----------
-log("\nStep 1: write temp:", TEMP)
-with open(TEMP, "wb") as f:
-    n = f.write(DATA)
-log("  wrote bytes:", n)
+if len(DATA) < SECTOR:
+    # ---------- Step 1: Direct write to TARGET (fewer FS ops, not atomic) ----------
+    log("\nStep 1: write:", TARGET)
+    with open(TARGET, "wb") as f:
+        n = f.write(DATA)
+    os.sync()  # flush FS buffers to the card; no settle delay needed
+    log("  wrote bytes:", n)
 
-# ---------- Step 2: Stat TEMP and atomically replace TARGET ----------
-try:
-    # Some ports return a tuple; index 6 is file size in many MicroPython builds.
-    log("  temp size:", os.stat(TEMP)[6])
-except Exception as e:
-    # Non-fatal: just informative if stat fails on this platform.
-    log("  stat(temp) fail:", e)
+else:
+    # ---------- Step 1: Write to TEMP and close ----------
+    log("\nStep 1: write temp:", TEMP)
+    with open(TEMP, "wb") as f:
+        n = f.write(DATA)
+    log("  wrote bytes:", n)
+
+    # ---------- Step 2: Stat TEMP and atomically replace TARGET ----------
+    if VERBOSE:
+        try:
+            # Some ports return a tuple; index 6 is file size in many MicroPython builds.
+            log("  temp size:", os.stat(TEMP)[6])
+        except Exception as e:
+            # Non-fatal: just informative if stat fails on this platform.
+            log("  stat(temp) fail:", e)
 
-try:
-    os.rename(TEMP, TARGET)
-    log("  renamed temp ->", TARGET)
-except Exception as e:
-    log("  rename fail:", e)
-    # Best-effort cleanup of TEMP; ignore further errors.
     try:
-        os.remove(TEMP)
-    except Exception:
-        pass
-    raise SystemExit(2)
-
-# Tiny settle before reopening same file (helps on some FS/SD stacks)
-time.sleep_ms(50)
+        os.rename(TEMP, TARGET)
+        log("  renamed temp ->", TARGET)
+    except Exception as e:
+        log("  rename fail:", e)
+        # Best-effort cleanup of TEMP; ignore further errors.
+        try:
+            os.remove(TEMP)
+        except Exception:
+            pass
+        raise SystemExit(2)
+    os.sync()
 
 # ---------- Step 3: Read back and compare ----------
 log("\nStep 3: read back:", TARGET)
@@ -21,17 +21,23 @@
 #   "esp_epoch": 1730000000   // optional (seconds). If missing, server time is used.
 # }
 #
-# The server computes event_start_utc = esp_epoch - duration_ms and inserts.
-# Returns 204 No Content (silent on success; prints simple logs).
+# MySQL computes event_start_utc = FROM_UNIXTIME(esp_epoch) - duration_ms on insert
+# (session time zone pinned to UTC).
+# Events arriving within BATCH_WINDOW_S of each other are written with one
+# multi-row INSERT on a pooled aiomysql connection (DB I/O never blocks the loop).
+# Returns 204 No Content (silent on success; prints simple logs), or 503 if the
+# database is unreachable. The server still starts with MySQL down; the pool is
+# (re)created on the first insert after it comes back.
 # ---------------------------------------------------------------------------
 
+import asyncio
 import time
-from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import Annotated, Optional
 
+import aiomysql
+import msgspec
 import pymysql
-from fastapi import FastAPI, Header, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 
 app = FastAPI(title="Noise Detector API (Event Store)")
 
@@ -44,59 +50,166 @@ DB_USER = "Your Info"
 DB_PASS = "Your Info"
 DB_NAME = "noise_db"
 TABLE   = "noise_events"
+DB_CONNECT_TIMEOUT_S = 5  # fail fast when MySQL is down (aiomysql default: none)
 
-def get_conn():
-    """Create a new PyMySQL connection (autocommit)."""
-    return pymysql.connect(
+# ---- Logging ----------------------------------------------------------------
+LOG_EVENTS = True  # print one line per event (set False to skip on busy servers)
+
+# ---- Batching ---------------------------------------------------------------
+BATCH_WINDOW_S = 0.020  # rows queued within this window share one INSERT
+
+# event_start_utc = end (epoch seconds) - duration, computed by MySQL in UTC.
+# The VALUES tuple is repeated per row by insert_rows(); executemany() can't be
+# used because aiomysql only rewrites placeholder-only VALUES into one statement
+# and would otherwise send one INSERT per row.
+INSERT_PREFIX = f"INSERT INTO {TABLE} (device_id, event_start_utc, duration_ms, peak_dbfs) VALUES "
+ROW_VALUES_SQL = "(%s, FROM_UNIXTIME(%s) - INTERVAL %s MICROSECOND, %s, %s)"
+
+async def make_pool():
+    """Create the aiomysql connection pool (autocommit, UTC session time zone)."""
+    return await aiomysql.create_pool(
         host=DB_HOST,
         user=DB_USER,
         password=DB_PASS,
-        database=DB_NAME,
+        db=DB_NAME,
         autocommit=True,
         charset="utf8mb4",
-        cursorclass=pymysql.cursors.Cursor,
+        init_command="SET time_zone = '+00:00'",  # FROM_UNIXTIME() returns UTC
+        connect_timeout=DB_CONNECT_TIMEOUT_S,
+        minsize=2,
+        maxsize=10,
     )
 
+async def get_pool():
+    """Return the connection pool, creating it on first use (raises OperationalError if MySQL is down)."""
+    if app.state.pool is None:
+        app.state.pool = await make_pool()
+    return app.state.pool
+
+async def insert_rows(rows):
+    """Insert a batch of rows with one multi-row INSERT on a pooled connection."""
+    sql = INSERT_PREFIX + ",".join([ROW_VALUES_SQL] * len(rows))
+    params = [v for row in rows for v in row]
+    pool = await get_pool()
+    async with pool.acquire() as conn, conn.cursor() as cur:
+        await cur.execute(sql, params)
+
+def _settle(fut, exc=None):
+    """Resolve a caller's future unless it was already cancelled."""
+    if fut.done():
+        return
+    if exc is None:
+        fut.set_result(None)
+    else:
+        fut.set_exception(exc)
+
+async def batch_writer():
+    """Drain queued rows every BATCH_WINDOW_S and resolve each caller's future."""
+    queue = app.state.queue
+    while True:
+        batch = [await queue.get()]
+        await asyncio.sleep(BATCH_WINDOW_S)
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        try:
+            await insert_rows([row for row, _ in batch])
+        except (pymysql.err.DataError, pymysql.err.IntegrityError) as e:
+            if len(batch) == 1:
+                _settle(batch[0][1], e)
+            else:
+                # A bad row sinks the whole all-or-nothing INSERT, so retry row
+                # by row to give each caller its own outcome (no duplicates)
+                lost = None
+                for row, fut in batch:
+                    if lost is not None:
+                        _settle(fut, lost)  # connection dropped mid-retry
+                        continue
+                    try:
+                        await insert_rows([row])
+                    except pymysql.err.OperationalError as row_err:
+                        lost = row_err
+                        _settle(fut, row_err)
+                    except Exception as row_err:
+                        _settle(fut, row_err)
+                    else:
+                        _settle(fut)
+        except Exception as e:
+            # Connection-level failure (e.g. OperationalError): every row would
+            # fail the same way, so fail the whole batch at once
+            for _, fut in batch:
+                _settle(fut, e)
+        else:
+            for _, fut in batch:
+                _settle(fut)
+
+@app.on_event("startup")
+async def startup():
+    """Open the connection pool (if MySQL is up) and start the batch writer."""
+    app.state.pool = None
+    try:
+        await get_pool()
+    except pymysql.err.OperationalError as e:
+        print("DB ERROR at startup (will retry on first event):", e)
+    app.state.queue = asyncio.Queue()
+    app.state.writer = asyncio.create_task(batch_writer())
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the batch writer and close pooled connections."""
+    app.state.writer.cancel()
+    if app.state.pool is not None:
+        app.state.pool.close()
+        await app.state.pool.wait_closed()
+
+@app.exception_handler(pymysql.err.OperationalError)
+async def db_unavailable(request: Request, exc: pymysql.err.OperationalError):
+    """Report an unreachable/failing database as 503 (registered once, app-wide)."""
+    print("DB ERROR:", exc)
+    return Response(status_code=503)
+
 # ---- Request model ----------------------------------------------------------
-class NoiseEvent(BaseModel):
-    device_id: str = Field(..., max_length=64, description="ESP32 identifier")
-    duration_ms: int = Field(..., ge=1, description="Event length in milliseconds")
-    peak_dbfs: float = Field(..., description="Peak loudness (dBFS), negative number")
-    esp_epoch: Optional[int] = Field(
-        None, description="Device timestamp in SECONDS (UNIX epoch). If absent, server time is used."
-    )
+class NoiseEvent(msgspec.Struct):
+    device_id: Annotated[str, msgspec.Meta(max_length=64, description="ESP32 identifier")]
+    duration_ms: Annotated[int, msgspec.Meta(ge=1, le=4294967295, description="Event length in milliseconds")]
+    peak_dbfs: Annotated[float, msgspec.Meta(ge=-999.99, le=999.99, description="Peak loudness (dBFS), negative number")]
+    esp_epoch: Annotated[Optional[Annotated[int, msgspec.Meta(ge=0, le=32536771199)]], msgspec.Meta(
+        description="Device timestamp in SECONDS (UNIX epoch), within FROM_UNIXTIME()'s range. If absent, server time is used."
+    )] = None
+
+# Decoder is built once; it parses and validates the raw body in one C pass
+NOISE_DECODER = msgspec.json.Decoder(NoiseEvent)
 
 # ---- Endpoint ---------------------------------------------------------------
 @app.post("/noise", status_code=204)
-async def noise(evt: NoiseEvent, x_api_key: str = Header(None)):
+async def noise(request: Request, x_api_key: str = Header(None)):
     """Accept a noise event and write it to MySQL using the schema above."""
     # Simple header auth
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Bad API key")
 
-    # Determine event end time (seconds) then compute start (UTC)
+    # Decode + validate body (lengths / column ranges enforced by NoiseEvent's Meta)
+    try:
+        evt = NOISE_DECODER.decode(await request.body())
+    except msgspec.DecodeError as e:  # includes msgspec.ValidationError
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Determine event end time (seconds); MySQL derives the start from it
     ts_end = evt.esp_epoch if evt.esp_epoch is not None else int(time.time())
-    start_dt_utc = datetime.fromtimestamp(ts_end, tz=timezone.utc) - timedelta(milliseconds=evt.duration_ms)
 
     # Log one concise line for diagnostics
-    print(
-        f"device_id={evt.device_id} "
-        f"start={start_dt_utc.isoformat()} "
-        f"dur={evt.duration_ms}ms "
-        f"peak={evt.peak_dbfs:.2f}dBFS"
-    )
+    if LOG_EVENTS:
+        print(
+            f"device_id={evt.device_id} "
+            f"end_epoch={ts_end} "
+            f"dur={evt.duration_ms}ms "
+            f"peak={evt.peak_dbfs:.2f}dBFS"
+        )
 
-    # Insert row (MySQL DATETIME(6) is naive; drop tzinfo)
-    try:
-        with get_conn() as conn, conn.cursor() as cur:
-            cur.execute(
-                f"""
-                INSERT INTO {TABLE} (device_id, event_start_utc, duration_ms, peak_dbfs)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (evt.device_id, start_dt_utc.replace(tzinfo=None), evt.duration_ms, round(evt.peak_dbfs, 2)),
-            )
-    except Exception as e:
-        # Keep device flow quiet: print error, still return 204 (as per your test style)
-        print("DB ERROR:", e)
-        return
+    # Queue row for the batch writer
+    row = (evt.device_id, ts_end, evt.duration_ms * 1000, evt.duration_ms, round(evt.peak_dbfs, 2))
+    fut = asyncio.get_running_loop().create_future()
+    await app.state.queue.put((row, fut))
+    await fut  # DB errors propagate to db_unavailable / the default 500 handler
+
+    # Bare 204: skips FastAPI's response serialization for a None return
+    return Response(status_code=204)
@@ -1,11 +1,12 @@
 // esp_to_api.ino
 // -----------------------------------------------------------------------------
-// ESP32 bridge: reads a single line from Teensy over UART and POSTs JSON to API.
-// Expected line from Teensy on *event end*:
+// ESP32 bridge: reads one binary frame from Teensy over UART and POSTs JSON to API.
+// Expected frame from Teensy on *event end* (921600 baud, little-endian, 6 bytes):
 //
-//   NOISE <duration_ms> <peak_dbfs>\n
+//   u8 type (=1) | u16 duration_ms | i16 peak_dbfs * 256 | u8 checksum
 //
-// Example: "NOISE 1234 -12.34"
+// checksum = sum of the first 5 bytes & 0xFF. Bytes are skipped until a type
+// byte is seen, so the reader resyncs after a dropped or corrupt frame.
 //
 // The ESP32 stamps current epoch seconds (NTP) and sends:
 // {
@@ -38,8 +39,12 @@ const char* DEVICE_ID = "esp32-01";
 // Teensy D1 (TX1) -> RX_GPIO, Teensy D0 (RX1) <- TX_GPIO (TX optional)
 #define RX_GPIO 38
 #define TX_GPIO 37
+#define LINK_BAUD 921600
 HardwareSerial Link(1);
 
+#define FRAME_NOISE 1
+#define FRAME_LEN   6
+
 // ---- Activity LED (optional) ------------------------------------------------
 #define LED_PIN 13
 #define LED_ACTIVE_LOW false
@@ -56,16 +61,17 @@ static void ensureWifi() {
   Serial.printf("\nWiFi: connected, IP=%s\n", WiFi.localIP().toString().c_str());
 }
 
-// Parse "NOISE <duration_ms> <peak_dbfs>"
-static bool parseNOISE(const String& line, long& out_dur_ms, float& out_peak_dbfs) {
-  if (!line.startsWith("NOISE")) return false;
-  int s1 = line.indexOf(' ');
-  if (s1 < 0) return false;
-  int s2 = line.indexOf(' ', s1 + 1);
-  if (s2 < 0) return false;
-  out_dur_ms    = line.substring(s1 + 1, s2).toInt();
-  out_peak_dbfs = line.substring(s2 + 1).toFloat();
-  return out_dur_ms > 0;
+// Verify the additive checksum of a 6-byte NOISE frame
+static bool frameChecksumOK(const uint8_t* f) {
+  uint8_t sum = 0;
+  for (int i = 0; i < FRAME_LEN - 1; i++) sum += f[i];
+  return sum == f[FRAME_LEN - 1];
+}
+
+// Decode a checksum-verified NOISE frame (type byte already checked by the caller)
+static void parseNOISE(const uint8_t* f, long& out_dur_ms, float& out_peak_dbfs) {
+  out_dur_ms    = (long)(uint16_t)(f[1] | (f[2] << 8));
+  out_peak_dbfs = (int16_t)(f[3] | (f[4] << 8)) / 256.0f;
 }
 
 // POST the event to your FastAPI server
@@ -101,7 +107,8 @@ static int postNoise(long duration_ms, float peak_dbfs) {
 // ---- Arduino lifecycle ------------------------------------------------------
 void setup() {
   Serial.begin(115200);
-  Link.begin(115200, SERIAL_8N1, RX_GPIO, TX_GPIO);
+  Link.begin(LINK_BAUD, SERIAL_8N1, RX_GPIO, TX_GPIO);
+  Link.setTimeout(20);  // rest of a frame arrives in well under 1 ms
 
   pinMode(LED_PIN, OUTPUT);
   led_off();
@@ -117,15 +124,24 @@ void setup() {
 void loop() {
   if (!Link.available()) { delay(5); return; }
 
-  // Read one complete line from Teensy
-  String line = Link.readStringUntil('\n');
-  line.trim();
-  if (!line.length()) return;
+  // Sync on the type byte, then read the rest of the frame
+  uint8_t frame[FRAME_LEN];
+  frame[0] = (uint8_t)Link.read();
+  if (frame[0] != FRAME_NOISE) return;
+  if (Link.readBytes(frame + 1, FRAME_LEN - 1) != FRAME_LEN - 1) {
+    Serial.println("WARN: short frame");
+    return;
+  }
 
   long dur_ms = 0;
   float peak = 0.0f;
-  if (!parseNOISE(line, dur_ms, peak)) {
-    Serial.printf("WARN: could not parse line: %s\n", line.c_str());
+  if (!frameChecksumOK(frame)) {
+    Serial.println("WARN: bad frame checksum");
+    return;
+  }
+  parseNOISE(frame, dur_ms, peak);
+  if (dur_ms <= 0) {
+    Serial.println("WARN: frame with zero duration, skipped");
     return;
   }
 
@@ -1,9 +1,12 @@
 # teensy_to_esp.py
 # -----------------------------------------------------------------------------
 # Teensy 4.1 + Adafruit SPH0645 (I2S) running MicroPython
-# Detects sound events and sends **one** ASCII line to the ESP32 on event end:
+# Detects sound events and sends **one** 6-byte binary frame to the ESP32 on
+# event end (UART1 @ 921600, little-endian):
 #
-#   NOISE <duration_ms> <peak_dbfs>\n
+#   u8 type (=1) | u16 duration_ms | i16 peak_dbfs * 256 | u8 checksum
+#
+# checksum = sum of the first 5 bytes & 0xFF.
 #
 # ESP32 then forwards this to your API with device_id/timing.
 #
@@ -16,13 +19,21 @@
 #   mpremote connect COM9 run teensy_to_esp.py
 #
 # Notes:
-# - Plain ASCII prints (Windows-friendly).
+# - Plain ASCII prints (Windows-friendly). Per-event logs are off unless
+#   DEBUG = 1; the ESP32 already prints every event it forwards.
 # - EXIT threshold is clamped so the event ends promptly.
 # - Recalibrate with button on D2.
+# - I2S runs non-blocking into two ping-pong buffers: RMS of one chunk is
+#   computed while the driver fills the other.
 # -----------------------------------------------------------------------------
 
-from machine import Pin, I2S, UART
-import time, struct, array, math
+from machine import Pin, I2S, UART, idle
+import gc, time, array, math, struct, micropython
+from micropython import const
+try:
+    import _thread              # not built into every port's firmware
+except ImportError:
+    _thread = None
 
 # ---- Pins / I2S -------------------------------------------------------------
 LED_PIN = "D13"
@@ -32,8 +43,12 @@ BCLK_PIN, WS_PIN, SD_PIN, MCK_PIN = "D21", "D20", "D8", "D23"
 # ---- I2S framing ------------------------------------------------------------
 RATE = 44100
 BITS_PER_WORD = 32
-CHUNK_BYTES = 4096              # 1024 samples/chunk
-IBUF_BYTES = 20000
+CHUNK_BYTES = 4096              # 1024 samples/chunk (must be 4 * a power of two)
+IBUF_BYTES = 2048               # driver ring; small is fine with ping-pong chunks
+
+# ---- ESP32 link -------------------------------------------------------------
+UART_BAUD = 921600
+FRAME_NOISE = 1                 # frame type byte for an event-end record
 
 # ---- Detection tuning -------------------------------------------------------
 CALIBRATION_S = 5.0             # baseline capture time
@@ -48,41 +63,75 @@ EXIT_K_SIGMA_MIN = 1.0          # clamp EXIT >= mean + 1σ (prevents "stuck in e
 
 # Filtering & end debounce
 SMOOTHING_ALPHA = 0.25          # EMA smoothing for detector
+ALPHA_Q8 = int(SMOOTHING_ALPHA * 256)   # same alpha in Q8 for the integer EMA
 END_DEBOUNCE_MS = 200           # must stay below EXIT for this long to end
 
 # UX helpers
-EVENT_HEARTBEAT_MS = 1000       # '.' each second while in event (0 to disable)
+DEBUG = const(0)                # 1: print per-event logs over USB (can stall the loop on host backpressure)
+EVENT_HEARTBEAT_MS = 1000       # one '.' per second of event, printed at event end (0 to disable)
 MAX_EVENT_S = 6.0               # safety timeout to force end (0 to disable)
 
-# ---- Helpers ----------------------------------------------------------------
-def to_signed24(v: int) -> int:
-    v &= 0xFFFFFF
-    if v & 0x800000: v -= 1 << 24
-    return v
-
-def rms_int16(vals: array.array) -> int:
-    if not vals: return 0
-    acc = 0
-    for x in vals: acc += x * x
-    return int(math.sqrt(acc / len(vals)))
+# Derived once here so the loops compare plain ints (no float math per chunk).
+# const() only takes integer literals, so these stay ordinary globals.
+_CALIBRATION_MS = int(CALIBRATION_S * 1000)
+_MIN_DUR_MS = int(MIN_DURATION_S * 1000)
+_MAX_EVENT_MS = int(MAX_EVENT_S * 1000)
+_HEARTBEAT_ENABLED = DEBUG and EVENT_HEARTBEAT_MS > 0   # dots only feed the logs
 
+# ---- Helpers ----------------------------------------------------------------
 def dbfs(rms: int) -> float:
     return 20.0 * math.log10(max(rms,1)/32768.0)
 
-def read_chunk(i2s, mv):
-    """Read one I2S chunk and return RMS(int16)."""
-    n = i2s.readinto(mv)
-    if not n: return 0
-    words = struct.unpack("<%dI" % (n // 4), mv[:n])
-    vals16 = array.array('h')
-    ap = vals16.append
-    for w in words:
-        s24 = to_signed24(w >> 8)   # valid top 24 bits
-        s16 = s24 >> 8              # scale to int16-ish
-        if s16 < -32768: s16 = -32768
-        elif s16 > 32767: s16 = 32767
-        ap(s16)
-    return rms_int16(vals16)
+# 20*log10 of each 1/16 mantissa bin midpoint, in centi-dB (dbfs_fast term)
+_LOG_LUT = array.array('h', [int(2000 * math.log10(1 + (i + 0.5)/16) + 0.5) for i in range(16)])
+
+def dbfs_fast(rms: int) -> int:
+    """dBFS in centi-dB from bit length + 4-bit mantissa LUT (integer only, ~0.3 dB)."""
+    if rms < 1: rms = 1
+    bl = 0; x = rms
+    while x: x >>= 1; bl += 1
+    return 602 * (bl - 16) + _LOG_LUT[((rms << 4) >> (bl - 1)) & 0x0F]
+
+@micropython.viper
+def meansq_words(src: ptr32, shift: int) -> int:
+    """Mean square of the int16 samples in 2**shift I2S words, native code.
+    The 64-bit sum is kept as lo/hi words and divided by shifting, so the
+    result comes back as a small int (no boxed long per chunk)."""
+    lo = uint(0); hi = uint(0)
+    for i in range(1 << shift):
+        s = int(src[i]) >> 16       # arithmetic shift: signed top 16 of 24 valid bits
+        sq = uint(s * s)
+        lo += sq
+        if lo < sq: hi += 1         # carry out of the low word
+    ms = (hi << (32 - shift)) | (lo >> shift)
+    if ms > uint(0x3FFFFFFF):       # 2**30 only for a full-scale square wave;
+        ms = uint(0x3FFFFFFF)       # clamp to stay a small int (isqrt -> 32767)
+    return int(ms)
+
+@micropython.viper
+def isqrt(x: uint) -> int:
+    """floor(sqrt(x)) for a 32-bit unsigned value; no math.isqrt on MicroPython."""
+    r = uint(0)
+    bit = uint(1 << 30)
+    while bit > x:
+        bit >>= 2
+    while bit != 0:
+        if x >= r + bit:
+            x -= r + bit
+            r = (r >> 1) + bit
+        else:
+            r >>= 1
+        bit >>= 2
+    return int(r)
+
+def read_chunk():
+    """Return RMS(int16) of the next full I2S chunk, sleeping until one is ready."""
+    global _ready
+    while _ready < 0:
+        idle()                  # WFI until the next interrupt (I2S callback et al.)
+    r = _ready
+    _ready = -1
+    return isqrt(meansq_words(bufs[r], _CHUNK_SHIFT))
 
 def safe_print(s):
     try: print(s)
@@ -96,35 +145,57 @@ i2s = I2S(1,
           sck=Pin(BCLK_PIN), ws=Pin(WS_PIN), sd=Pin(SD_PIN), mck=Pin(MCK_PIN),
           mode=I2S.RX, bits=BITS_PER_WORD, format=I2S.MONO, rate=RATE, ibuf=IBUF_BYTES)
 
-buf = bytearray(CHUNK_BYTES); mv = memoryview(buf)
 SAMPLES_PER_CHUNK = CHUNK_BYTES // 4
 CHUNK_MS = int(1000 * (SAMPLES_PER_CHUNK / RATE))  # ~23 ms
-
-# Teensy 4.1 UART1 is fixed to D1 (TX), D0 (RX) on this port
-uart = UART(1, 115200)
+_CHUNK_SHIFT = 0                # log2(SAMPLES_PER_CHUNK): mean = sum >> shift
+while (1 << _CHUNK_SHIFT) < SAMPLES_PER_CHUNK: _CHUNK_SHIFT += 1
+assert (1 << _CHUNK_SHIFT) == SAMPLES_PER_CHUNK, "CHUNK_BYTES must be 4 * a power of two"
+_CAL_CHUNKS = max(1, _CALIBRATION_MS // CHUNK_MS)
+
+# Ping-pong capture buffers: the driver fills bufs[_active] while the main
+# loop reduces bufs[_ready] (-1 = no unread chunk).
+bufs = (bytearray(CHUNK_BYTES), bytearray(CHUNK_BYTES))
+_active = 0
+_ready = -1
+
+def _on_rx(i2s):
+    """I2S callback: the active buffer is full; publish it and refill the other."""
+    global _active, _ready
+    _ready = _active
+    _active ^= 1
+    i2s.readinto(bufs[_active])
+
+i2s.irq(_on_rx)                 # non-blocking mode: readinto() returns at once
+i2s.readinto(bufs[_active])
+
+# Teensy 4.1 UART1 is fixed to D1 (TX), D0 (RX) on this port.
+# txbuf holds many whole event frames, so uart.write() returns without
+# waiting on the wire.
+uart = UART(1, UART_BAUD, txbuf=256, rxbuf=64)
+
+# All capture/reduction buffers exist by now. Start from a clean heap and make
+# the collector run after a modest amount of new allocation, rather than only
+# when the heap is exhausted.
+gc.collect()
+gc.threshold(gc.mem_free() // 4 + gc.mem_alloc())
 
 # ---- Calibration ------------------------------------------------------------
+@micropython.native
 def calibrate():
     """Measure quiet-room mean/std and compute ENTER/EXIT thresholds."""
     safe_print("Calibrating quiet-room baseline (%.1f s)..." % CALIBRATION_S)
     led.on()
 
-    n_chunks = max(1, int((CALIBRATION_S * 1000) // CHUNK_MS))
-    rms_vals = array.array('H')
-    t_end = time.ticks_add(time.ticks_ms(), int(CALIBRATION_S*1000))
-    while time.ticks_diff(t_end, time.ticks_ms()) > 0 and len(rms_vals) < n_chunks:
-        r = read_chunk(i2s, mv)
-        if r: rms_vals.append(r)
+    # Single-pass Welford mean/variance; no per-chunk history is kept
+    n_chunks = _CAL_CHUNKS
+    n = 0; m = 0.0; m2 = 0.0
+    t_end = time.ticks_add(time.ticks_ms(), _CALIBRATION_MS)
+    while time.ticks_diff(t_end, time.ticks_ms()) > 0 and n < n_chunks:
+        r = read_chunk()
+        n += 1
+        d = r - m; m += d / n; m2 += d * (r - m)
 
-    if len(rms_vals) == 0:
-        mean = 0; std = 0
-    else:
-        m = sum(rms_vals) / len(rms_vals)
-        var = 0.0
-        for r in rms_vals:
-            d = r - m; var += d*d
-        var /= max(1, len(rms_vals)-1)
-        mean = int(m); std = int(math.sqrt(var))
+    mean = int(m); std = int(math.sqrt(m2 / max(1, n-1)))
 
     enter1 = int(mean * MULTIPLIER)
     enter2 = int(mean + K_SIGMA * std)
@@ -142,96 +213,146 @@ def calibrate():
 ENTER_TH, EXIT_TH = calibrate()
 safe_print("Listening...")
 
-# ---- Main loop --------------------------------------------------------------
-smooth = 0
-in_event = False
-event_peak_rms = 0
-event_start_ms = None
-below_exit_ms = 0
-last_heartbeat = time.ticks_ms()
-above_ms = 0
-
-def heartbeat():
-    if EVENT_HEARTBEAT_MS <= 0: return
-    try: print(".", end="")
-    except TypeError: print(".")
+# ---- Event ring -------------------------------------------------------------
+# Single-producer/single-consumer FIFO between the detector and the UART sender.
+# Records are "<IhH": duration_ms, peak_dbfs*256, seq. head is only advanced by
+# send_event_to_esp() and tail only by drain_events(), so no lock is needed.
+EV_SLOTS = 8                    # power of two
+EV_SIZE = 8
+_ev_ring = bytearray(EV_SLOTS * EV_SIZE)
+_ev_head = 0                    # free-running counts, compared mod 2**16
+_ev_tail = 0
+_ev_seq = 0
+_frame = bytearray(6)           # wire frame, packed in place for every event
 
 def send_event_to_esp(duration_ms, peak_db):
-    """Emit one line for the ESP32 to parse and forward."""
-    line = "NOISE %d %.2f\n" % (int(duration_ms), float(peak_db))
-    try: uart.write(line)
-    except Exception as e: safe_print("UART write failed: %r" % (e,))
+    """Queue one event for the ESP32; drops it if the ring is full."""
+    global _ev_head, _ev_seq
+    if (_ev_head - _ev_tail) & 0xFFFF >= EV_SLOTS:
+        safe_print("Event ring full, dropped seq %d" % _ev_seq)
+    else:
+        q8 = max(-32768, min(32767, int(peak_db * 256)))
+        struct.pack_into("<IhH", _ev_ring, (_ev_head & (EV_SLOTS-1)) * EV_SIZE,
+                         int(duration_ms), q8, _ev_seq)
+        _ev_head = (_ev_head + 1) & 0xFFFF     # publish only after the record is written
+    _ev_seq = (_ev_seq + 1) & 0xFFFF
+
+def drain_events():
+    """Send every queued event to the ESP32 as a 6-byte binary frame."""
+    global _ev_tail
+    while _ev_tail != _ev_head:
+        dur, q8, seq = struct.unpack_from("<IhH", _ev_ring, (_ev_tail & (EV_SLOTS-1)) * EV_SIZE)
+        dur = min(65535, dur)
+        crc = (FRAME_NOISE + dur + (dur >> 8) + q8 + (q8 >> 8)) & 0xFF   # == sum of bytes 0..4
+        struct.pack_into("<BHhB", _frame, 0, FRAME_NOISE, dur, q8, crc)
+        try: uart.write(_frame)
+        except Exception as e: safe_print("UART write failed (seq %d): %r" % (seq, e))
+        _ev_tail = (_ev_tail + 1) & 0xFFFF
+
+def _event_writer():
+    """Background sender: the only consumer of the ring when threads exist."""
+    while True:
+        if _ev_tail != _ev_head: drain_events()
+        else: idle()
+
+if _thread is not None:
+    _thread.start_new_thread(_event_writer, ())
+
+# ---- Main loop --------------------------------------------------------------
+def main(enter_th, exit_th):
+    """Detection loop. Names used every chunk are bound to locals once up front
+    (MicroPython resolves globals and module attributes by dict lookup)."""
+    ticks_ms = time.ticks_ms; ticks_diff = time.ticks_diff
+    read = read_chunk; btn_value = btn.value
+    chunk_ms = CHUNK_MS; alpha = ALPHA_Q8; beta = 256 - ALPHA_Q8
+    end_debounce_ms = END_DEBOUNCE_MS; min_dur_ms = _MIN_DUR_MS
+    max_event_ms = _MAX_EVENT_MS; heartbeat_on = _HEARTBEAT_ENABLED
+    heartbeat_ms = EVENT_HEARTBEAT_MS; inline_drain = _thread is None
+
+    smooth = 0
+    in_event = False
+    event_peak_rms = 0
+    event_start_ms = None
+    below_exit_ms = 0
+    last_heartbeat = ticks_ms()
+    beats = 0                   # heartbeat dots owed; printed once at event end
+    above_ms = 0
 
-try:
     while True:
+        # Without _thread, hand queued events to the UART before the next chunk
+        if inline_drain and _ev_tail != _ev_head:
+            drain_events()
+
         # Recalibrate on button press (active LOW)
-        if not btn.value():
-            safe_print("(Recalibrate)")
-            ENTER_TH, EXIT_TH = calibrate()
+        if not btn_value():
+            if DEBUG: safe_print("(Recalibrate)")
+            enter_th, exit_th = calibrate()
             smooth = 0; in_event = False
             event_peak_rms = 0; event_start_ms = None
-            below_exit_ms = 0; last_heartbeat = time.ticks_ms(); above_ms = 0
+            below_exit_ms = 0; last_heartbeat = ticks_ms(); beats = 0; above_ms = 0
 
-        r = read_chunk(i2s, mv)
-        if r == 0:
-            time.sleep_ms(5)
-            continue
+        r = read()
 
-        # EMA smoothing
-        smooth = int(SMOOTHING_ALPHA*r + (1.0-SMOOTHING_ALPHA)*smooth)
-        now = time.ticks_ms()
+        # EMA smoothing (Q8 fixed point, no floats)
+        smooth = (alpha*r + beta*smooth) >> 8
+        now = ticks_ms()
 
         # Enter event: require sustained above ENTER_TH
         if not in_event:
-            if smooth >= ENTER_TH:
-                above_ms += CHUNK_MS
+            if smooth >= enter_th:
+                above_ms += chunk_ms
             else:
                 above_ms = 0
 
-            if above_ms >= int(MIN_DURATION_S*1000):
+            if above_ms >= min_dur_ms:
                 in_event = True
                 led.on()
                 event_start_ms = now
                 event_peak_rms = smooth
                 below_exit_ms = 0
-                safe_print(">>> SOUND DETECTED (>= %.1f s). ENTER=%d, EXIT=%d" % (MIN_DURATION_S, ENTER_TH, EXIT_TH))
+                last_heartbeat = now; beats = 0
+                if DEBUG: safe_print(">>> SOUND DETECTED (>= %.1f s). ENTER=%d, EXIT=%d" % (MIN_DURATION_S, enter_th, exit_th))
 
         # Inside event: track peak, check for end
         else:
             if smooth > event_peak_rms:
                 event_peak_rms = smooth
 
-            if EVENT_HEARTBEAT_MS > 0 and time.ticks_diff(now, last_heartbeat) >= EVENT_HEARTBEAT_MS:
-                heartbeat(); last_heartbeat = now
+            if heartbeat_on and ticks_diff(now, last_heartbeat) >= heartbeat_ms:
+                beats += 1; last_heartbeat = now
 
-            if smooth < EXIT_TH:
-                below_exit_ms += CHUNK_MS
+            if smooth < exit_th:
+                below_exit_ms += chunk_ms
             else:
                 below_exit_ms = 0
 
             # Natural end (fast, debounced)
-            if below_exit_ms >= END_DEBOUNCE_MS:
+            if below_exit_ms >= end_debounce_ms:
                 in_event = False
                 led.off()
-                dur_ms = time.ticks_diff(now, event_start_ms) if event_start_ms is not None else 0
-                peak_db = dbfs(event_peak_rms)
-                safe_print("\n<<< SOUND ENDED. duration=%.3f s, peak=%.2f dBFS" % (dur_ms/1000.0, peak_db))
-                safe_print("(re-armed)")
+                dur_ms = ticks_diff(now, event_start_ms) if event_start_ms is not None else 0
+                peak_db = dbfs(event_peak_rms)      # exact value goes to the ESP32
+                if DEBUG:
+                    safe_print("." * beats + "\n<<< SOUND ENDED. duration=%d ms, peak~%d dBFS" % (dur_ms, (dbfs_fast(event_peak_rms) + 50) // 100))
+                    safe_print("(re-armed)")
                 send_event_to_esp(dur_ms, peak_db)
                 event_peak_rms = 0; event_start_ms = None; below_exit_ms = 0; above_ms = 0
                 continue
 
             # Safety timeout (prevents getting stuck in very loud rooms)
-            if MAX_EVENT_S > 0 and time.ticks_diff(now, event_start_ms) >= int(MAX_EVENT_S*1000):
+            if max_event_ms > 0 and ticks_diff(now, event_start_ms) >= max_event_ms:
                 in_event = False
                 led.off()
-                dur_ms = time.ticks_diff(now, event_start_ms)
+                dur_ms = ticks_diff(now, event_start_ms)
                 peak_db = dbfs(event_peak_rms)
-                safe_print("\n<<< SOUND ENDED (timeout). duration=%.3f s, peak=%.2f dBFS" % (dur_ms/1000.0, peak_db))
-                safe_print("(re-armed)")
+                if DEBUG:
+                    safe_print("." * beats + "\n<<< SOUND ENDED (timeout). duration=%d ms, peak~%d dBFS" % (dur_ms, (dbfs_fast(event_peak_rms) + 50) // 100))
+                    safe_print("(re-armed)")
                 send_event_to_esp(dur_ms, peak_db)
                 event_peak_rms = 0; event_start_ms = None; below_exit_ms = 0; above_ms = 0
 
+try:
+    main(ENTER_TH, EXIT_TH)
 except KeyboardInterrupt:
     safe_print("\nStopping...")
 finally:
@@ -1,25 +1,32 @@
 # api.py
 import time
-from fastapi import FastAPI, Header, HTTPException, Request
-from pydantic import BaseModel
+import msgspec
+from fastapi import FastAPI, HTTPException, Request, Response
 from typing import Literal, Optional
 
 app = FastAPI(title="ESP32 LED Logger (Test)")
 
 API_KEY = "1234"  # simple test key, THIS IS BAD FOR SECURITY but okay because this is just a test program
 
-class LedEvent(BaseModel):
+class LedEvent(msgspec.Struct):
     device_id: str
     state: Literal["LED_ON", "LED_OFF"]
     esp_epoch: Optional[int] = None  # optional timestamp from ESP32
 
+LED_DECODER = msgspec.json.Decoder(LedEvent)
+
 @app.post("/events", status_code=204)
-async def events(evt: LedEvent, request: Request, x_api_key: str = Header(None)):
-    # Tiny auth for testing
-    if x_api_key != API_KEY:
+async def events(request: Request):
+    # Tiny auth for testing (read straight from the headers; no Header dependency)
+    if request.headers.get("x-api-key") != API_KEY:
         raise HTTPException(status_code=401, detail="Bad API key")
 
+    try:
+        evt = LED_DECODER.decode(await request.body())
+    except msgspec.DecodeError as e:  # includes msgspec.ValidationError
+        raise HTTPException(status_code=422, detail=str(e))
+
     # Print ONLY the LED state, per your request
     # (You’ll still see server logs from Uvicorn around it)
     print(evt.state)
-    return
+    return Response(status_code=204)
@@ -1,5 +1,5 @@
 # teensy_to_esp.py
-from machine import Pin, UART
+from machine import Pin, UART, idle
 import time
 
 # UART1 on Teensy 4.1 uses D1 (TX) / D0 (RX)
@@ -9,24 +9,30 @@ u = UART(1, 115200)
 button = Pin("D2", Pin.IN, Pin.PULL_UP)
 
 toggled = False
-last_state = 1
+last_level = button.value()
 last_change = time.ticks_ms()
 DEBOUNCE_MS = 120  # adjust if needed
 
-print("Teensy ready (UART1 D1/D0, button D2)")
-
-while True:
-    s = button.value()
+def _on_edge(p):
+    # Soft IRQ on both edges, same rule as the old poll loop: a level change
+    # more than DEBOUNCE_MS after the last accepted one counts, and only a
+    # 1 -> 0 change is a PRESS. last_level follows every sample so a quick
+    # release inside the debounce window doesn't swallow the next press.
+    global toggled, last_level, last_change
+    s = p.value()
     now = time.ticks_ms()
-
-    # Edge detect with debounce
-    if s != last_state and time.ticks_diff(now, last_change) > DEBOUNCE_MS:
+    if s != last_level and time.ticks_diff(now, last_change) > DEBOUNCE_MS:
         last_change = now
         if s == 0:  # on PRESS
             toggled = not toggled
             msg = b"LED_ON\n" if toggled else b"LED_OFF\n"
             u.write(msg)
             print("Sent:", msg.strip())
+    last_level = s
 
-    last_state = s
-    time.sleep(0.005)
+button.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=_on_edge)
+
+print("Teensy ready (UART1 D1/D0, button D2)")
+
+while True:
+    idle()  # sleep until the next interrupt; all work happens in _on_edge